@@ -0,0 +1,37 @@
+import sys
+import time
+import argparse
+
+from main import Agent
+from positions import decode_position
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Makes moves for a file of encoded positions, one per line.")
+    parser.add_argument("positions", help="file of positions encoded with positions.encode_position")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--chunksize", type=int, default=64, help="positions sent to a worker at a time")
+    parser.add_argument("--seed", type=int, help="master seed, makes the moves reproducible")
+    args = parser.parse_args()
+
+    agent = Agent(seed=args.seed)
+    with open(args.positions) as f:
+        positions = (decode_position(line) for line in f if line.strip())
+
+        # Results are printed as `index board tile`, in the order they finish
+        count = 0
+        start = time.perf_counter()
+        for index, move in agent.make_moves(positions, workers=args.workers, chunksize=args.chunksize):
+            print(f"{index} {move[0]} {move[1]}")
+            count += 1
+        elapsed = time.perf_counter() - start
+
+    print(
+        f"{count} positions in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.0f} positions/s), "
+        f"{agent.nodes} nodes ({agent.nodes / elapsed if elapsed else 0:.0f} nodes/s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,68 @@
 import random
 import numpy as np
-from typing import List, Optional, Tuple
+from multiprocessing import Pool
+from typing import Iterable, Iterator, List, Optional, Tuple
 
+from positions import Position
 from uttt import BaseAgent, UTTTGame
 
 
+def derive_seed(seed: int, stream: object) -> int:
+    """Derives the seed of an independent random stream from a master seed.
+
+    The derived seed only depends on its arguments, so runs using the same master
+    seed get the same streams regardless of process, worker or scheduling order.
+
+    Args:
+        seed (int): The master seed.
+        stream (object): Identifies the stream, e.g. a worker or position index.
+
+    Returns:
+        int: The seed of the stream.
+    """
+
+    return random.Random(f"{seed}/{stream}").getrandbits(64)
+
+
+# The agent used by each batch worker process, reused for every position the worker handles
+_batch_agent = None
+
+
+def _init_batch_worker(agent: "Agent") -> None:
+    """Stores the agent a batch worker process makes its moves with.
+
+    Every worker receives a copy of the same agent, random state included. Unseeded
+    agents are reseeded from fresh entropy so the workers draw independent streams.
+    """
+
+    global _batch_agent
+    _batch_agent = agent
+    if agent.seed is None:
+        agent.rng.seed()
+
+
+def _batch_move(job: Tuple[int, Position]) -> Tuple[int, Tuple[int, int], int]:
+    """Makes a move for one position of a batch in a worker process, along with the nodes it searched."""
+
+    index, position = job
+    nodes = _batch_agent.nodes
+    move = _batch_agent._move_for_position(index, position)
+    return index, move, _batch_agent.nodes - nodes
+
+
 class Agent(BaseAgent):
 
-    def __init__(self):
+    def __init__(self, seed: Optional[int] = None):
+        """Creates the agent.
+
+        Args:
+            seed (Optional[int]): Seeds the agent's random choices for reproducible runs.
+                                  Without a seed, moves are not reproducible.
+        """
         super().__init__()
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.nodes = 0  # number of candidate moves considered, a measure of work done
         self.LOCAL_POS_REWARD = np.array([
             1, 0, 1,
             0, 2, 0,
@@ -62,12 +116,71 @@ class Agent(BaseAgent):
         ]
 
         # Pick a valid move at random
-        move = random.choice(possible_moves)
+        self.nodes += len(possible_moves)
+        move = self.rng.choice(possible_moves)
+        self.report_progress(move, visits=1)
 
         ################################################################################
 
         return move
 
+    def _move_for_position(self, index: int, position: Position) -> Tuple[int, int]:
+        """Makes a move for an independent position, playing as its player to move.
+
+        When the agent is seeded, each position gets its own random stream derived from
+        the seed and the position's index, so the move does not depend on which worker
+        makes it or on what that worker made before.
+
+        Args:
+            index (int): The index of the position in its batch.
+            position (Position): The position to move in.
+
+        Returns:
+            Tuple[int, int]: The local board and tile position to mark.
+        """
+        player, boards, board_winners, playable_boards = position
+        if self.seed is not None:
+            self.rng.seed(derive_seed(self.seed, index))
+        self.set_player(player)
+        return self.make_move(
+            boards=boards,
+            board_winners=board_winners,
+            playable_boards=playable_boards,
+        )
+
+    def make_moves(
+        self,
+        positions: Iterable[Position],
+        workers: int = 1,
+        chunksize: int = 64,
+    ) -> Iterator[Tuple[int, Tuple[int, int]]]:
+        """Makes moves for a stream of independent positions.
+
+        Each worker process receives one copy of this agent and reuses it for every
+        position it handles, so any tables or caches the agent keeps are shared
+        between positions instead of being rebuilt per position. Nodes searched by
+        the workers are added to this agent's node count.
+
+        Args:
+            positions (Iterable[Position]): The positions to move in, e.g. decoded with positions.decode_position.
+            workers (int): The number of worker processes. With 1, moves are made in this process.
+            chunksize (int): The number of positions sent to a worker at a time.
+
+        Returns:
+            Iterator[Tuple[int, Tuple[int, int]]]: The index of each position in the stream and the
+                                                   move made for it, in the order they finish.
+        """
+        jobs = enumerate(positions)
+        if workers <= 1:
+            for index, position in jobs:
+                yield index, self._move_for_position(index, position)
+            return
+
+        with Pool(workers, initializer=_init_batch_worker, initargs=(self,)) as pool:
+            for index, move, nodes in pool.imap_unordered(_batch_move, jobs, chunksize=chunksize):
+                self.nodes += nodes
+                yield index, move
+
 
 def main():
     # Instantiate the agent
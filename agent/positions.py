@@ -0,0 +1,77 @@
+from typing import List, Optional, Tuple
+
+# A position as (player to move, boards, board_winners, playable_boards)
+Position = Tuple[str, List[List[Optional[str]]], List[Optional[str]], List[int]]
+
+PLAYERS = "RB"
+MARKS = ".RBS"  # '.' for None, 'S' for stalemate
+BOARD_INDICES = [str(board) for board in range(0, 9)]
+NO_PLAYABLE_BOARDS = "-"
+
+
+def encode_position(
+    player: str,
+    boards: List[List[Optional[str]]],
+    board_winners: List[Optional[str]],
+    playable_boards: List[int],
+) -> str:
+    """Encodes a position as a single line of text.
+
+    The line holds the player to move, the 81 tiles of the global board, the 9 local
+    board winners (both using '.' for None) and the comma separated playable boards,
+    or '-' if there are none, e.g. `R ....R....(...) ......... 4`.
+
+    Args:
+        player (str): The player to move (R for red or B for blue).
+        boards (List[List[Optional[str]]]): The local boards, which together form the global board.
+        board_winners (List[Optional[str]]): The winners of each local board.
+        playable_boards (List[int]): The local boards that may be played in.
+
+    Returns:
+        str: The encoded position.
+    """
+
+    tiles = "".join(tile or "." for board in boards for tile in board)
+    winners = "".join(winner or "." for winner in board_winners)
+    playable = ",".join(str(board) for board in playable_boards) or NO_PLAYABLE_BOARDS
+    return f"{player} {tiles} {winners} {playable}"
+
+
+def decode_position(line: str) -> Position:
+    """Decodes a position encoded by `encode_position`.
+
+    Args:
+        line (str): The encoded position.
+
+    Raises:
+        ValueError: The line is not a valid encoded position.
+
+    Returns:
+        Position: The player to move, the local boards, the local board winners and the playable boards.
+    """
+
+    parts = line.split()
+    if len(parts) != 4:
+        raise ValueError(f"`{line.strip()}` is not a valid encoded position.")
+
+    player, tiles, winners, playable = parts
+    if player not in PLAYERS or len(player) != 1:
+        raise ValueError(f"`{player}` is not a valid player, expected one of {PLAYERS}.")
+    if len(tiles) != 81 or any(tile not in MARKS for tile in tiles):
+        raise ValueError(f"`{tiles}` is not a valid board, expected 81 of {MARKS}.")
+    if len(winners) != 9 or any(winner not in MARKS for winner in winners):
+        raise ValueError(f"`{winners}` are not valid board winners, expected 9 of {MARKS}.")
+
+    if playable == NO_PLAYABLE_BOARDS:
+        playable_boards = []
+    elif all(board in BOARD_INDICES for board in playable.split(",")):
+        playable_boards = [int(board) for board in playable.split(",")]
+    else:
+        raise ValueError(f"`{playable}` are not valid playable boards, expected 0 to 8 or `-`.")
+
+    boards = [
+        [None if tile == "." else tile for tile in tiles[board * 9 : board * 9 + 9]]
+        for board in range(0, 9)
+    ]
+    board_winners = [None if winner == "." else winner for winner in winners]
+    return player, boards, board_winners, playable_boards
@@ -1,18 +1,75 @@
+import os
 import sys
+import argparse
+import threading
 import collections
 import pygame as pg
 import numpy as np
-from random import randint
+from random import Random
 from itertools import product
-from agent.main import Agent
+from main import Agent
 
-pg.init()
-pg.event.set_allowed([pg.QUIT, pg.MOUSEBUTTONDOWN])
+
+class AgentWorker(threading.Thread):
+
+    def __init__(self, agent, boards, board_winners, playable_boards):
+        """
+        Runs the agent's search in a background thread so the pygame window stays responsive
+
+        Args:
+            agent (BaseAgent): agent to request a move from.
+            boards (List[List[Optional[str]]]): copy of the global board.
+            board_winners (List[Optional[str]]): copy of the winners of each local board.
+            playable_boards (List[int]): copy of the local boards that may be played in.
+        """
+        super().__init__(daemon=True)
+        self.agent = agent
+        self.boards = boards
+        self.board_winners = board_winners
+        self.playable_boards = playable_boards
+
+        self.move = None  # move chosen by the agent, set once the search is done
+        self.best_move = None  # best move reported so far by the search
+        self.visits = 0  # visit count of the best move reported so far
+        self.error = None  # exception raised by the agent, re-raised on the UI thread
+        self.stop_event = threading.Event()
+
+    def _on_progress(self, move, visits):
+        """
+        Records the progress reported by the agent's search
+
+        Args:
+            move (Tuple[int, int]): best move found so far.
+            visits (int): visit count of the best move.
+        """
+        self.best_move, self.visits = move, visits
+
+    def run(self):
+        self.agent.progress_callback = self._on_progress
+        self.agent.stop_event = self.stop_event
+        try:
+            self.move = self.agent.make_move(
+                boards=self.boards,
+                board_winners=self.board_winners,
+                playable_boards=self.playable_boards
+            )
+        except Exception as e:
+            self.error = e
+        finally:
+            self.agent.progress_callback = None
+            self.agent.stop_event = None
+
+    def cancel(self):
+        """
+        Asks the agent's search to stop and waits briefly for it to finish
+        """
+        self.stop_event.set()
+        self.join(timeout=1)
 
 
 class UltimateTicTacToe:
 
-    def __init__(self):
+    def __init__(self, headless=False, record_path=None, seed=None):
         # Screen
         self.WIDTH = 640
         self.ROWS = 3
@@ -21,11 +78,26 @@ class UltimateTicTacToe:
         self.LOCAL_WIDTH = (self.WIDTH - self.GAP * 4) // self.ROWS  # width of a local board
         self.LOCAL_DISTANCE = self.GAP + self.LOCAL_WIDTH  # distance between two consecutive local boards
         self.CELL_WIDTH = self.LOCAL_WIDTH // self.ROWS  # width of one cell
+        self.STATUS_RECT = pg.Rect(  # strip below the boards used for the thinking indicator
+            (0, self.WIDTH - self.GAP + 3),
+            (self.WIDTH, self.GAP - 3)
+        )
 
-        self.FPS = 10  # limit game to 10 FPS
+        self.FPS = 30  # frame rate while the agent is thinking
         self.clock = pg.time.Clock()
-        self.win = pg.display.set_mode((self.WIDTH, self.WIDTH))  # pygame window
-        pg.display.set_caption("Ultimate TicTacToe")
+
+        # In headless mode the board is drawn to an offscreen surface, so no display is required
+        self.headless = headless
+        self.record_path = record_path  # file finished games are appended to, if any
+        if self.headless:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pg.init()
+        if self.headless:
+            self.win = pg.Surface((self.WIDTH, self.WIDTH))  # offscreen surface
+        else:
+            pg.event.set_allowed([pg.QUIT, pg.MOUSEBUTTONDOWN])
+            self.win = pg.display.set_mode((self.WIDTH, self.WIDTH))  # pygame window
+            pg.display.set_caption("Ultimate TicTacToe")
 
         # Colors
         self.BLACK = (0, 30, 60)
@@ -36,6 +108,26 @@ class UltimateTicTacToe:
         self.YELLOW = (245, 230, 75)
 
         # Game Board and Logic
+        self.reset()
+
+        # Randomness, seeding it makes the starting board and the agent's moves reproducible
+        self.rng = Random(seed)
+
+        # Agent
+        self.agent = Agent(seed=None if seed is None else self.rng.getrandbits(64))
+        # DOXA uses R, B, and S for red, blue, and stalemate respectively.
+        # These dictionaries help translate the DOXA lingo with the variables in this program
+        self.player_turn_dict = {True: "R", False: "B"}
+        self.player_color_dict = {"R": self.RED, "B": self.GREEN, "S": self.YELLOW, None: self.LIGHT_GRAY}
+        self.font = pg.font.Font(None, 22)
+
+    def reset(self):
+        """
+        Resets the game board and logic to the start of a new game.
+
+        Returns:
+            None
+        """
         self.global_board = np.array(
             [
                 np.full(shape=self.ROWS ** 2, fill_value=None)
@@ -46,13 +138,8 @@ class UltimateTicTacToe:
         self.playable_boards = []  # Boards on which current turn can be played
         self.turn = True  # True if user's turn, false if agent's turn
         self.winner = None
-
-        # Agent
-        self.agent = Agent()
-        # DOXA uses R, B, and S for red, blue, and stalemate respectively.
-        # These dictionaries help translate the DOXA lingo with the variables in this program
-        self.player_turn_dict = {True: "R", False: "B"}
-        self.player_color_dict = {"R": self.RED, "B": self.GREEN, "S": self.YELLOW, None: self.LIGHT_GRAY}
+        self.move_history = []  # Moves played so far, as (local_board, cell)
+        self.dirty_boards = set(range(self.ROWS ** 2))  # Local boards that must be redrawn
 
     def __str__(self):
         """
@@ -84,7 +171,15 @@ class UltimateTicTacToe:
         Args:
             x (float): x co-ordinate of the top left corner where the board must be drawn.
             y (float): y co-ordinate of the top left corner where the board must be drawn.
+            local_board (int): index of the local board to draw.
+
+        Returns:
+            pg.Rect: the area of the surface that was redrawn.
         """
+        # clear the local board, including the grid lines that overhang its edges
+        area = pg.Rect((x, y), (self.LOCAL_WIDTH, self.LOCAL_WIDTH)).inflate(4, 4)
+        self.win.fill(self.BLACK, area)
+
         # highlight playable boards
         if local_board in self.playable_boards:
             pg.draw.rect(
@@ -121,25 +216,128 @@ class UltimateTicTacToe:
                 end_pos=(x + self.LOCAL_WIDTH, y + self.CELL_WIDTH * i),
                 width=3
             )
+        return area
 
-    def _render_board(self):
+    def _render_board(self, full=False):
         """
-        Draws and renders the full game board.
+        Draws and renders the local boards that changed since the last render.
+
+        Args:
+            full (bool): if True, the whole game board is redrawn.
 
         Returns:
                 None
         """
-        self.win.fill(self.BLACK)
+        if full:
+            self.win.fill(self.BLACK)
+            self.dirty_boards = set(range(self.ROWS ** 2))
 
-        # draw local board
+        # draw dirty local boards
+        updated = []
         for i, j in product(range(self.ROWS), range(self.ROWS)):
-            self._draw_local(
-                x=self.GAP + j * self.LOCAL_DISTANCE,
-                y=self.GAP + i * self.LOCAL_DISTANCE,
-                local_board=self.ROWS * i + j
+            if self.ROWS * i + j in self.dirty_boards:
+                updated.append(self._draw_local(
+                    x=self.GAP + j * self.LOCAL_DISTANCE,
+                    y=self.GAP + i * self.LOCAL_DISTANCE,
+                    local_board=self.ROWS * i + j
+                ))
+        self.dirty_boards.clear()
+
+        if not self.headless:
+            if full:
+                pg.display.update()
+            else:
+                pg.display.update(updated)
+
+    def _draw_thinking(self, worker, frame, outlined):
+        """
+        Draws the thinking indicator and the agent's current best move while it searches
+
+        Args:
+            worker (AgentWorker): worker running the agent's search.
+            frame (int): number of frames drawn since the search started, used to animate the indicator.
+            outlined (int): local board outlined on the previous frame, or None.
+
+        Returns:
+            int: local board outlined on this frame, or None.
+        """
+        best_move, visits = worker.best_move, worker.visits
+        self.win.fill(self.BLACK, self.STATUS_RECT)
+        text = "Thinking" + "." * (frame // (self.FPS // 3) % 4)
+        if best_move is not None:
+            text += f"   best move: board {best_move[0]}, cell {best_move[1]}"
+            text += f"   visits: {visits}"
+        label = self.font.render(text, True, self.LIGHT_GRAY)
+        self.win.blit(label, label.get_rect(midleft=(self.GAP, self.STATUS_RECT.centery)))
+        updated = [self.STATUS_RECT]
+
+        # erase the previous outline, which may be on another board than the current best move
+        if outlined is not None:
+            self.dirty_boards.add(outlined)
+
+        # outline the best move found so far, the board is redrawn once the move is played
+        local_board = None
+        if best_move is not None:
+            local_board, cell = best_move
+            self.dirty_boards.add(local_board)
+        self._render_board()
+        if best_move is not None:
+            cell_rect = pg.Rect(
+                (
+                    self.GAP + (local_board % self.ROWS) * self.LOCAL_DISTANCE + (cell % self.ROWS) * self.CELL_WIDTH,
+                    self.GAP + (local_board // self.ROWS) * self.LOCAL_DISTANCE + (cell // self.ROWS) * self.CELL_WIDTH
+                ),
+                (self.CELL_WIDTH, self.CELL_WIDTH)
             )
+            pg.draw.rect(surface=self.win, color=self.YELLOW, rect=cell_rect.inflate(-12, -12), width=4)
+            updated.append(cell_rect)
+
+        if not self.headless:
+            pg.display.update(updated)
+        return local_board
 
-        pg.display.update()
+    def _clear_thinking(self):
+        """
+        Clears the thinking indicator
+
+        Returns:
+            None
+        """
+        self.win.fill(self.BLACK, self.STATUS_RECT)
+        if not self.headless:
+            pg.display.update(self.STATUS_RECT)
+
+    def _agent_turn(self):
+        """
+        Runs the agent's search in the background while keeping the window responsive
+
+        Returns:
+            Tuple[int, int]: the move chosen by the agent (local_board, cell)
+        """
+        worker = AgentWorker(
+            agent=self.agent,
+            boards=self.global_board.copy().tolist(),
+            board_winners=self.board_winners[:],
+            playable_boards=self.playable_boards[:]
+        )
+        worker.start()
+        frame = 0
+        outlined = None  # local board holding the best move outline
+        while worker.is_alive():
+            for event in pg.event.get():
+                # if user quits game, stop the search before exiting
+                if event.type == pg.QUIT:
+                    worker.cancel()
+                    pg.quit()
+                    sys.exit()
+            outlined = self._draw_thinking(worker=worker, frame=frame, outlined=outlined)
+            frame += 1
+            self.clock.tick(self.FPS)
+        worker.join()
+        self._clear_thinking()
+        if worker.error is not None:
+            raise worker.error
+        return worker.move
 
     def _in_range(self, corner, length, coord):
         """
@@ -200,6 +398,9 @@ class UltimateTicTacToe:
         """
         # place move
         self.global_board[move] = self.player_turn_dict[self.turn]
+        self.move_history.append(move)
+        self.dirty_boards.add(move[0])
+        self.dirty_boards.update(self.playable_boards)  # previously highlighted boards
 
         # update board winners if applicable
         board_state = self._check_status(self.global_board[move[0]])
@@ -214,24 +415,25 @@ class UltimateTicTacToe:
         elif self.board_winners[move[1]] in ("R", "B", "S"):
             open_boards = [i for i in range(self.ROWS ** 2) if self.board_winners[i] is None]
             self.playable_boards = open_boards
+        self.dirty_boards.update(self.playable_boards)  # newly highlighted boards
 
         # check global win
         global_status = self._check_status(np.array(self.board_winners))
         if global_status == "W":
             self.winner = self.player_turn_dict[self.turn]
-        elif global_status == "S":
-            self.winner = "S"
+        elif global_status == "S" or not self.playable_boards:
+            self.winner = "S"  # also a stalemate when every local board is decided without a win
 
     def _play_turn(self, move):
         """
-        Given a move plays one turn, for agent or user
+        Given a move plays one turn, for agent or user. Only the game state is
+        updated, the affected local boards are drawn on the next render.
 
         Args:
             move (Tuple[int, int]): the location on the grid (local_board, cell)
         """
 
         self._place_move(move=move)
-        self._render_board()
         self.turn = not self.turn
 
     def _win_arr(self, arr):
@@ -288,9 +490,9 @@ class UltimateTicTacToe:
             return "S"
         return "U"
 
-    def _game_over(self):
+    def _draw_game_over(self):
         """
-        Puts the game in to game over state, where no more moves can be made
+        Draws the game over border in the winner's color
 
         Returns:
             None
@@ -310,7 +512,19 @@ class UltimateTicTacToe:
                 end_pos=(self.WIN_BORDER + i * (self.WIDTH - 2 * self.WIN_BORDER), self.WIDTH - self.WIN_BORDER),
                 width=6
             )
-        pg.display.update()
+        if not self.headless:
+            pg.display.update()
+
+    def _game_over(self):
+        """
+        Puts the game in to game over state, where no more moves can be made
+
+        Returns:
+            None
+        """
+        self._draw_game_over()
+        if self.record_path is not None:
+            self.save_record(self.record_path)
 
         # wait until user quits game
         pg.event.clear()
@@ -328,10 +542,9 @@ class UltimateTicTacToe:
             None
         """
         run = True
-        self.playable_boards = [randint(0, 8)]  # pick random starting local board
-        self._render_board()
+        self.playable_boards = [self.rng.randint(0, 8)]  # pick random starting local board
+        self._render_board(full=True)
         while run:
-            self.clock.tick(self.FPS)
             pg.event.clear()
 
             # user's turn
@@ -346,21 +559,156 @@ class UltimateTicTacToe:
                     user_input = self._valid_input(mouse_press=mouse_press)
                     if user_input is not False:
                         self._play_turn(move=user_input)
+                        self._render_board()
                         if self.winner is not None:
                             self._game_over()
 
             # agents turn
             if not self.turn:
-                move = self.agent.make_move(
-                    boards=self.global_board.copy().tolist(),
-                    board_winners=self.board_winners[:],
-                    playable_boards=self.playable_boards[:]
-                )
+                move = self._agent_turn()
                 self._play_turn(move=move)
+                self._render_board()
                 if self.winner is not None:
                     self._game_over()
 
+    def play_agents(self, red, blue):
+        """
+        Plays a full game between two agents without rendering, red moves first
+
+        Args:
+            red (BaseAgent): agent playing as red.
+            blue (BaseAgent): agent playing as blue.
+
+        Returns:
+            str: the winner, "R", "B" or "S" for stalemate.
+        """
+        self.reset()
+        self.playable_boards = [self.rng.randint(0, 8)]  # pick random starting local board
+        agents = {True: red, False: blue}
+        red.set_player(self.player_turn_dict[True])
+        blue.set_player(self.player_turn_dict[False])
+        while self.winner is None:
+            move = agents[self.turn].make_move(
+                boards=self.global_board.copy().tolist(),
+                board_winners=self.board_winners[:],
+                playable_boards=self.playable_boards[:]
+            )
+            self._play_turn(move=move)
+        return self.winner
+
+    def replay(self, moves, frame_dir=None, final_image=None):
+        """
+        Replays a recorded game, optionally saving an image of the board after every move
+
+        Args:
+            moves (List[Tuple[int, int]]): the moves of the game in order, as (local_board, cell).
+            frame_dir (str): directory to save one frame per move in, or None to skip frames.
+            final_image (str): path to save an image of the final position to, or None to skip it.
+
+        Returns:
+            None
+        """
+        self.reset()
+        if moves:
+            self.playable_boards = [moves[0][0]]  # the first move picks the starting local board
+        self._render_board(full=True)
+        if frame_dir is not None:
+            os.makedirs(frame_dir, exist_ok=True)
+            pg.image.save(self.win, os.path.join(frame_dir, "000.png"))
+
+        for move_num, move in enumerate(moves, start=1):
+            self._play_turn(move=move)
+            self._render_board()
+            if self.winner is not None:
+                self._draw_game_over()
+            if frame_dir is not None:
+                pg.image.save(self.win, os.path.join(frame_dir, f"{move_num:03d}.png"))
+            if self.winner is not None:
+                break
+
+        if final_image is not None:
+            pg.image.save(self.win, final_image)
+
+    def save_record(self, path):
+        """
+        Appends the moves played so far to a file of recorded games, one game per line
+
+        Args:
+            path (str): path of the recorded games file.
+
+        Returns:
+            None
+        """
+        with open(path, "a") as f:
+            f.write(encode_moves(self.move_history) + "\n")
+
+
+def encode_moves(moves):
+    """
+    Encodes a list of moves as a line of space separated "local_board,cell" pairs
+
+    Args:
+        moves (List[Tuple[int, int]]): moves to encode.
+
+    Returns:
+        str: the encoded moves.
+    """
+    return " ".join(f"{board},{cell}" for board, cell in moves)
+
+
+def decode_moves(line):
+    """
+    Decodes a line produced by encode_moves back into a list of moves
+
+    Args:
+        line (str): the encoded moves.
+
+    Returns:
+        List[Tuple[int, int]]: the decoded moves.
+    """
+    return [tuple(int(n) for n in move.split(",")) for move in line.split()]
+
+
+def export_games(path, out_dir, frames=False):
+    """
+    Renders every game in a recorded games file headlessly, saving the final position
+    of each game and, optionally, a frame for every move.
+
+    Args:
+        path (str): path of the recorded games file.
+        out_dir (str): directory to write the images to.
+        frames (bool): if True, also save one frame per move for each game.
+
+    Returns:
+        int: the number of games exported.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    uttt = UltimateTicTacToe(headless=True)
+    count = 0
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            uttt.replay(
+                moves=decode_moves(line),
+                frame_dir=os.path.join(out_dir, f"game_{count:05d}") if frames else None,
+                final_image=os.path.join(out_dir, f"game_{count:05d}.png")
+            )
+            count += 1
+    return count
+
 
 if __name__ == "__main__":
-    uttt = UltimateTicTacToe()
-    uttt.main()
+    parser = argparse.ArgumentParser(description="Ultimate TicTacToe")
+    parser.add_argument("--record", help="append the played game to this recorded games file")
+    parser.add_argument("--export", help="headlessly render the games in this recorded games file")
+    parser.add_argument("--out", default="frames", help="directory to write exported images to")
+    parser.add_argument("--frames", action="store_true", help="export a frame for every move")
+    parser.add_argument("--seed", type=int, help="seed the starting board and the agent for a reproducible game")
+    args = parser.parse_args()
+
+    if args.export:
+        export_games(path=args.export, out_dir=args.out, frames=args.frames)
+    else:
+        uttt = UltimateTicTacToe(record_path=args.record, seed=args.seed)
+        uttt.main()
@@ -0,0 +1,429 @@
+"""
+Distributed Ultimate TicTacToe self-play.
+
+Run from the repository root like the other scripts in this folder, e.g.
+
+    python agent/selfplay.py coordinator --games 1000 --workers 4 --out selfplay.jsonl
+    python agent/selfplay.py worker --port <port> --authkey <authkey printed by the coordinator>
+
+The coordinator hands out game jobs to workers over a local socket and appends their
+game records to --out. Re-running the coordinator on the same --out resumes the run.
+Connections unpickle what they receive, so every run uses its own random authkey;
+workers take it with --authkey or from the UTTT_SELFPLAY_AUTHKEY environment variable.
+Several workers on localhost are exercised by `python -m pytest tests`.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import collections
+from multiprocessing import AuthenticationError, Process
+from multiprocessing.connection import Client, Listener
+
+from main import Agent, derive_seed
+from pygame_uttt import UltimateTicTacToe, encode_moves
+
+AUTHKEY_ENV = "UTTT_SELFPLAY_AUTHKEY"  # environment variable workers read the authkey from
+WORKER_JOIN_TIMEOUT = 10  # seconds local workers get to exit once the run is over
+BACKLOG = 128  # connections waiting to be accepted, workers often connect all at once
+
+
+def make_jobs(games, seed=0, red=None, blue=None):
+    """
+    Creates self-play game jobs, each with its own seed derived from the master seed
+
+    The job seeds also depend on the agent configs, so records of a run can be told
+    apart from records made with another master seed or other configs.
+
+    Args:
+        games (int): number of games to play.
+        seed (int): master seed of the run.
+        red (dict): agent config for red, see make_agent.
+        blue (dict): agent config for blue, see make_agent.
+
+    Raises:
+        ValueError: an agent config sets a parameter the agent does not have.
+
+    Returns:
+        List[dict]: the jobs, identified by their "id".
+    """
+    red, blue = red or {}, blue or {}
+    make_agent(red, seed=seed)  # fail before any game is handed out
+    make_agent(blue, seed=seed)
+    configs = json.dumps([red, blue], sort_keys=True)
+    return [
+        {"id": i, "seed": derive_seed(seed, f"{i}/{configs}"), "red": red, "blue": blue}
+        for i in range(games)
+    ]
+
+
+def make_agent(config, seed):
+    """
+    Creates an agent from a config of agent attributes to override, e.g. {"TWO_ROW_REWARD": 4}
+
+    Args:
+        config (dict): attribute values of the agent.
+        seed (int): seed of the agent.
+
+    Raises:
+        ValueError: the config sets a parameter the agent does not have.
+
+    Returns:
+        Agent: the configured agent.
+    """
+    agent = Agent(seed=seed)
+    for name, value in config.items():
+        if not hasattr(agent, name):
+            raise ValueError(f"The agent has no parameter `{name}`.")
+        setattr(agent, name, value)
+    return agent
+
+
+def play_job(uttt, job):
+    """
+    Plays the game described by a job headlessly
+
+    Args:
+        uttt (UltimateTicTacToe): headless game to play on.
+        job (dict): the job to play.
+
+    Returns:
+        dict: compact game record with the job id and seed, winner and encoded moves.
+    """
+    uttt.rng.seed(job["seed"])
+    winner = uttt.play_agents(
+        red=make_agent(job["red"], seed=derive_seed(job["seed"], "R")),
+        blue=make_agent(job["blue"], seed=derive_seed(job["seed"], "B"))
+    )
+    return {"job": job["id"], "seed": job["seed"], "winner": winner, "moves": encode_moves(uttt.move_history)}
+
+
+def run_worker(address, authkey, name=None):
+    """
+    Pulls jobs from a coordinator and plays them until no jobs are left or the coordinator exits
+
+    A job that raises is sent back as an error record instead of a game record.
+
+    Args:
+        address (Tuple[str, int]): address the coordinator listens on.
+        authkey (bytes): key shared with the coordinator.
+        name (str): name of the worker in the coordinator's report.
+
+    Returns:
+        None
+    """
+    conn = Client(address, authkey=authkey)
+    conn.send(name or f"worker-{os.getpid()}")
+    uttt = UltimateTicTacToe(headless=True)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break  # the coordinator finished and exited
+        if job is None:
+            break
+        start = time.perf_counter()
+        try:
+            record = play_job(uttt, job)
+        except Exception as e:
+            record = {"job": job["id"], "seed": job["seed"], "error": repr(e)}
+        conn.send((record, time.perf_counter() - start))
+    conn.close()
+
+
+class Coordinator:
+
+    def __init__(self, jobs, output_path, address=("localhost", 0), authkey=None):
+        """
+        Hands out self-play jobs to workers and collects their game records.
+
+        Records are appended to output_path as they arrive, which also serves as the
+        checkpoint: jobs already recorded there are skipped when the run is restarted.
+        Jobs of workers that disconnect before finishing are handed out again, jobs
+        that raise in a worker are reported as failed.
+
+        Args:
+            jobs (List[dict]): jobs to play, see make_jobs.
+            output_path (str): JSON lines file the game records are appended to.
+            address (Tuple[str, int]): address to listen on, port 0 picks a free port.
+            authkey (bytes): key shared with the workers, a random key if None.
+
+        Raises:
+            ValueError: the output file holds records made with other job seeds.
+        """
+        self.output_path = output_path
+        done = self._load_checkpoint(jobs)
+        self.pending = collections.deque(job for job in jobs if job["id"] not in done)
+        self.in_flight = {}  # job id -> job, for jobs handed to a worker
+        self.failed = {}  # job id -> error raised while playing the job
+        self.cond = threading.Condition()
+
+        # Stats
+        self.games = 0
+        self.workers = []  # names of the workers that connected, in order
+        self.worker_games = collections.Counter()
+        self.worker_busy = collections.defaultdict(float)  # seconds each worker spent playing
+        self.start = None
+        self.end = None
+
+        self.authkey = authkey or os.urandom(32)
+        self.listener = Listener(address, backlog=BACKLOG, authkey=self.authkey)
+        self.address = self.listener.address
+
+    def _load_checkpoint(self, jobs):
+        """
+        Reads the ids of the jobs already recorded in the output file
+
+        A truncated last line, left by a coordinator that died mid-write, is trimmed.
+
+        Args:
+            jobs (List[dict]): jobs of the run, to check the recorded seeds against.
+
+        Raises:
+            ValueError: a record was made with another seed than the job of the same id.
+
+        Returns:
+            Set[int]: ids of finished jobs.
+        """
+        if not os.path.exists(self.output_path):
+            return set()
+
+        seeds = {job["id"]: job["seed"] for job in jobs}
+        done = set()
+        with open(self.output_path, "rb+") as f:
+            lines = f.readlines()
+            offset = 0
+            for i, line in enumerate(lines):
+                try:
+                    record = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    record = None
+                if record is None:
+                    if i != len(lines) - 1:
+                        raise ValueError(f"Line {i + 1} of {self.output_path} is not a game record.")
+                    f.truncate(offset)  # trailing line of an interrupted write
+                    break
+                if record["job"] in seeds and record.get("seed") != seeds[record["job"]]:
+                    raise ValueError(
+                        f"Job {record['job']} in {self.output_path} was recorded with another seed or "
+                        f"agent configs, use a new output file for this run."
+                    )
+                done.add(record["job"])
+                offset += len(line)
+        return done
+
+    def _next_job(self):
+        """
+        Takes the next pending job, waiting while jobs in flight might still be handed out again
+
+        Returns:
+            dict: the job, or None once every job is finished.
+        """
+        with self.cond:
+            while not self.pending and self.in_flight:
+                self.cond.wait()
+            if not self.pending:
+                return None
+            job = self.pending.popleft()
+            self.in_flight[job["id"]] = job
+            return job
+
+    def _complete(self, worker, record, busy):
+        """
+        Checkpoints a finished game record, or marks its job failed if it is an error record
+
+        Args:
+            worker (str): name of the worker that played the game.
+            record (dict): the game or error record.
+            busy (float): seconds the worker spent playing the game.
+        """
+        with self.cond:
+            if self.in_flight.pop(record["job"], None) is None:
+                return  # already recorded
+            self.worker_busy[worker] += busy
+            if "error" in record:
+                self.failed[record["job"]] = record["error"]
+            else:
+                with open(self.output_path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+                self.games += 1
+                self.worker_games[worker] += 1
+            self.cond.notify_all()
+
+    def _serve_worker(self, conn):
+        """
+        Exchanges jobs and records with one worker until it is done or disconnects
+
+        Args:
+            conn (Connection): connection to the worker.
+        """
+        job = None
+        try:
+            worker = conn.recv()
+            with self.cond:
+                self.workers.append(worker)
+            while True:
+                job = self._next_job()
+                conn.send(job)
+                if job is None:
+                    break
+                record, busy = conn.recv()
+                self._complete(worker, record, busy)
+                job = None
+        except (EOFError, OSError):
+            pass  # the worker died, its job is handed out again below
+        finally:
+            if job is not None:
+                with self.cond:
+                    if self.in_flight.pop(job["id"], None) is not None:
+                        self.pending.appendleft(job)
+                    self.cond.notify_all()
+            conn.close()
+
+    def _accept(self):
+        """
+        Accepts worker connections, serving each in its own thread
+
+        Workers that connect once every job is finished are told so, until the
+        listener is closed.
+        """
+        while True:
+            try:
+                conn = self.listener.accept()
+            except (AuthenticationError, EOFError):
+                continue  # not one of our workers, or it went away during the handshake
+            except OSError:
+                return  # the listener was closed
+            threading.Thread(target=self._serve_worker, args=(conn,), daemon=True).start()
+
+    def run(self):
+        """
+        Serves workers until every job is finished
+
+        The listener keeps answering late workers until close is called.
+
+        Returns:
+            dict: stats of the run, see stats.
+        """
+        self.start = time.perf_counter()
+        threading.Thread(target=self._accept, daemon=True).start()
+        with self.cond:
+            while self.pending or self.in_flight:
+                self.cond.wait()
+        self.end = time.perf_counter()
+        return self.stats()
+
+    def close(self):
+        """
+        Stops accepting workers
+        """
+        self.listener.close()
+
+    def stats(self):
+        """
+        Aggregates games/sec and per worker utilization, the fraction of the run spent playing
+
+        Workers that connected without playing a game are reported with no utilization.
+
+        Returns:
+            dict: the stats.
+        """
+        elapsed = (self.end or time.perf_counter()) - self.start
+        with self.cond:
+            return {
+                "games": self.games,
+                "failed": dict(self.failed),
+                "seconds": elapsed,
+                "games_per_second": self.games / elapsed if elapsed else 0,
+                "workers": {
+                    worker: {
+                        "games": self.worker_games[worker],
+                        "utilization": self.worker_busy[worker] / elapsed if elapsed else 0
+                    }
+                    for worker in self.workers
+                }
+            }
+
+
+def report(stats):
+    """
+    Prints the stats of a self-play run
+
+    Args:
+        stats (dict): stats returned by Coordinator.run.
+    """
+    print(f"{stats['games']} games in {stats['seconds']:.2f}s ({stats['games_per_second']:.1f} games/s)")
+    for worker, worker_stats in sorted(stats["workers"].items()):
+        print(f"  {worker}: {worker_stats['games']} games, {worker_stats['utilization']:.0%} utilization")
+    for job, error in sorted(stats["failed"].items()):
+        print(f"  job {job} failed: {error}")
+
+
+def run_local(coordinator, workers):
+    """
+    Runs a coordinator with local worker processes
+
+    Args:
+        coordinator (Coordinator): the coordinator to run.
+        workers (int): number of local worker processes to start.
+
+    Returns:
+        dict: stats of the run, see Coordinator.stats.
+    """
+    processes = [Process(target=run_worker, args=(coordinator.address, coordinator.authkey)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    coordinator.run()
+
+    # workers that connect late are still answered until every worker has exited
+    deadline = time.monotonic() + WORKER_JOIN_TIMEOUT
+    for process in processes:
+        process.join(timeout=max(0, deadline - time.monotonic()))
+        if process.is_alive():
+            process.terminate()
+            process.join()
+    coordinator.close()
+    return coordinator.stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed Ultimate TicTacToe self-play")
+    subparsers = parser.add_subparsers(dest="role", required=True)
+
+    coordinator_parser = subparsers.add_parser("coordinator", help="hand out games and collect records")
+    coordinator_parser.add_argument("--games", type=int, default=100, help="number of games to play")
+    coordinator_parser.add_argument("--seed", type=int, default=0, help="master seed of the run")
+    coordinator_parser.add_argument("--red", type=json.loads, default={}, help="JSON agent config for red")
+    coordinator_parser.add_argument("--blue", type=json.loads, default={}, help="JSON agent config for blue")
+    coordinator_parser.add_argument("--out", default="selfplay.jsonl", help="game records and checkpoint file")
+    coordinator_parser.add_argument("--port", type=int, default=0, help="port to listen on, 0 picks a free port")
+    coordinator_parser.add_argument("--workers", type=int, default=0, help="local workers to start")
+
+    worker_parser = subparsers.add_parser("worker", help="play games handed out by a coordinator")
+    worker_parser.add_argument("--host", default="localhost", help="host of the coordinator")
+    worker_parser.add_argument("--port", type=int, required=True, help="port of the coordinator")
+    worker_parser.add_argument(
+        "--authkey",
+        default=os.environ.get(AUTHKEY_ENV),
+        help=f"hex authkey printed by the coordinator, defaults to ${AUTHKEY_ENV}"
+    )
+
+    args = parser.parse_args()
+    if args.role == "worker":
+        if args.authkey is None:
+            parser.error(f"worker needs --authkey or ${AUTHKEY_ENV}")
+        try:
+            authkey = bytes.fromhex(args.authkey)
+        except ValueError:
+            parser.error("--authkey must be the hex key printed by the coordinator")
+        run_worker(address=(args.host, args.port), authkey=authkey)
+    else:
+        try:
+            jobs = make_jobs(games=args.games, seed=args.seed, red=args.red, blue=args.blue)
+            coordinator = Coordinator(jobs=jobs, output_path=args.out, address=("localhost", args.port))
+        except ValueError as e:
+            sys.exit(str(e))
+        print(f"Listening on port {coordinator.address[1]} with authkey {coordinator.authkey.hex()}")
+        report(run_local(coordinator, args.workers))
@@ -14,6 +14,10 @@ class BaseAgent:
         self.player = None
         self.opponent = None
 
+        # Optional hooks set by front ends that run the agent in the background
+        self.progress_callback = None
+        self.stop_event = None
+
     def set_player(self, player: str) -> None:
         """Sets the current player and opponent.
 
@@ -24,6 +28,26 @@ class BaseAgent:
         self.player = player
         self.opponent = "B" if player == "R" else "R"
 
+    def report_progress(self, move: Tuple[int, int], visits: int) -> None:
+        """Reports the current best move of a search in progress.
+
+        Args:
+            move (Tuple[int, int]): The best local board and tile position found so far.
+            visits (int): The number of times the search has visited the move.
+        """
+
+        if self.progress_callback is not None:
+            self.progress_callback(move, visits)
+
+    def should_stop(self) -> bool:
+        """Checks whether the search has been asked to stop early.
+
+        Returns:
+            bool: True if the agent should return its best move as soon as possible.
+        """
+
+        return self.stop_event is not None and self.stop_event.is_set()
+
     def make_move(
         self,
         boards: List[List[Optional[str]]],
@@ -0,0 +1,119 @@
+import json
+import time
+from random import Random
+
+import pytest
+
+from main import Agent
+from positions import decode_position, encode_position
+from selfplay import WORKER_JOIN_TIMEOUT, Coordinator, make_jobs, run_local
+
+
+def read_records(path):
+    with open(path) as f:
+        return sorted((json.loads(line) for line in f), key=lambda record: record["job"])
+
+
+def random_positions(count, seed=0):
+    """Random positions with some tiles marked, decoded from their text encoding."""
+    rng = Random(seed)
+    positions = []
+    for _ in range(count):
+        boards = [[rng.choice([None, None, "R", "B"]) for _ in range(9)] for _ in range(9)]
+        playable_boards = [board for board in range(9) if None in boards[board]]
+        line = encode_position(rng.choice("RB"), boards, [None] * 9, playable_boards)
+        positions.append(decode_position(line))
+    return positions
+
+
+def test_late_workers_are_answered_and_reported(tmp_path):
+    output_path = tmp_path / "selfplay.jsonl"
+    start = time.monotonic()
+    stats = run_local(Coordinator(make_jobs(games=2), output_path), workers=8)
+
+    assert time.monotonic() - start < WORKER_JOIN_TIMEOUT  # no worker had to be terminated
+    assert stats["games"] == 2
+    assert [record["job"] for record in read_records(output_path)] == [0, 1]
+    assert len(stats["workers"]) == 8
+    assert sum(worker["games"] for worker in stats["workers"].values()) == 2
+
+
+def test_finished_run_resumes_with_nothing_to_play(tmp_path):
+    output_path = tmp_path / "selfplay.jsonl"
+    jobs = make_jobs(games=10)
+    run_local(Coordinator(jobs, output_path), workers=3)
+    records = read_records(output_path)
+
+    stats = run_local(Coordinator(jobs, output_path), workers=3)
+
+    assert stats["games"] == 0
+    assert read_records(output_path) == records
+
+
+def test_torn_checkpoint_is_trimmed_and_replayed(tmp_path):
+    output_path = tmp_path / "selfplay.jsonl"
+    jobs = make_jobs(games=10)
+    run_local(Coordinator(jobs, output_path), workers=3)
+    records = read_records(output_path)
+    with open(output_path, "rb+") as f:
+        f.truncate(output_path.stat().st_size - 10)
+
+    stats = run_local(Coordinator(jobs, output_path), workers=3)
+
+    assert stats["games"] == 1
+    assert read_records(output_path) == records
+
+
+def test_records_with_another_seed_are_rejected(tmp_path):
+    output_path = tmp_path / "selfplay.jsonl"
+    run_local(Coordinator(make_jobs(games=3), output_path), workers=2)
+
+    with pytest.raises(ValueError):
+        Coordinator(make_jobs(games=3, seed=1), output_path)
+    with pytest.raises(ValueError):
+        Coordinator(make_jobs(games=3, red={"TWO_ROW_REWARD": 4}), output_path)
+
+
+def test_invalid_agent_config_is_rejected_before_the_run():
+    with pytest.raises(ValueError):
+        make_jobs(games=3, red={"FOO": 1})
+
+
+def test_failing_job_is_reported_instead_of_handed_out_again(tmp_path):
+    jobs = [dict(job, red={"FOO": 1}) for job in make_jobs(games=2)]
+
+    stats = run_local(Coordinator(jobs, tmp_path / "selfplay.jsonl"), workers=3)
+
+    assert stats["games"] == 0
+    assert sorted(stats["failed"]) == [0, 1]
+
+
+def test_selfplay_records_do_not_depend_on_worker_count(tmp_path):
+    jobs = make_jobs(games=20, seed=5)
+    run_local(Coordinator(jobs, tmp_path / "one.jsonl"), workers=1)
+    run_local(Coordinator(jobs, tmp_path / "many.jsonl"), workers=4)
+
+    assert read_records(tmp_path / "one.jsonl") == read_records(tmp_path / "many.jsonl")
+
+
+def seeded_batch(positions, workers):
+    """Moves and node count of a seeded agent over a batch of positions."""
+    agent = Agent(seed=7)
+    moves = sorted(agent.make_moves(positions, workers=workers, chunksize=16))
+    return moves, agent.nodes
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_seeded_batch_is_reproducible(workers):
+    positions = random_positions(300)
+
+    assert seeded_batch(positions, workers) == seeded_batch(positions, workers)
+    assert seeded_batch(positions, workers) == seeded_batch(positions, workers=1)
+
+
+def test_unseeded_batch_workers_draw_independent_streams():
+    position = random_positions(1)[0]
+    moves = dict(Agent().make_moves([position] * 400, workers=4, chunksize=100))
+
+    chunks = {tuple(moves[index] for index in range(start, start + 100)) for start in range(0, 400, 100)}
+    assert len(chunks) == 4